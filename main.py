@@ -1,33 +1,73 @@
 import curses
 import yaml
 import os
-from typing import Dict, Any, List, Tuple, Optional
+import pickle
+import hashlib
+import re
+import struct
+import sys
+from typing import Dict, Any, List, Tuple, Optional, Sequence
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+try:
+    import termios
+except ImportError:  # e.g. windows-curses
+    termios = None
+
+# Bump when YAMLNode's attributes change so stale pickles are rebuilt
+CACHE_VERSION = 9
+
+# Child partitions shared by every leaf, so leaves don't carry two empty lists
+_NO_CHILDREN: Tuple['YAMLNode', ...] = ()
+
+# ${VAR} or ${VAR:default} placeholders in string values
+_ENV_RE = re.compile(r'\$\{([^:}]+)(?::([^}]*))?\}')
 
 
 class YAMLNode:
+    __slots__ = ('key', 'value', 'parent', 'children', 'is_leaf', 'env_var', 'comment',
+                 '_comment_len', '_path', '_nav_children', '_edit_children',
+                 '_nav_display', '_edit_display')
+
     def __init__(self, key: str, value: Any, parent: Optional['YAMLNode'] = None):
         self.key = key
         self.value = value
         self.parent = parent
         self.children: List[YAMLNode] = []
-        self.is_leaf = not isinstance(value, dict)
+        value_type = type(value)  # Loader yields plain dicts, so skip isinstance
+        self.is_leaf = value_type is not dict
         self.env_var = None
         self.comment = None
-
-        if isinstance(value, str):
-            if value.startswith("${") and "}" in value:
-                env_part = value[2:value.index("}")]
-                if ":" in env_part:
-                    self.env_var, default = env_part.split(":", 1)
-                else:
-                    self.env_var, default = env_part, ""
-                self.value = default
-
-        if isinstance(value, dict):
+        self._comment_len = 0
+        # Path used as the export.env name, joined onto the parent's path
+        if parent is None:
+            self._path = ''
+        elif parent._path:
+            self._path = f"{parent._path}_{key}"
+        else:
+            self._path = str(key)
+        self._nav_display = None  # Rendered rows, filled on first draw
+        self._edit_display = None
+
+        match = _ENV_RE.match(value) if value_type is str else None
+        if match:
+            self.env_var = match.group(1)
+            self.value = match.group(2) or ""
+
+        if value_type is dict:
             for k, v in value.items():
                 child = YAMLNode(k, v, self)
                 self.children.append(child)
 
+            self._nav_children = [c for c in self.children if not c.is_leaf]
+            self._edit_children = [c for c in self.children if c.is_leaf]
+        else:
+            self._nav_children = self._edit_children = _NO_CHILDREN
+
 
 class YAMLEditor:
     def __init__(self, stdscr, yaml_file: str):
@@ -35,6 +75,7 @@ class YAMLEditor:
         self.yaml_file = yaml_file
         self.changes: Dict[str, str] = {}
         self.original_values: Dict[str, str] = {}  # Store original values
+        self._leaves: List[YAMLNode] = []  # Every leaf of the tree, in one flat list
         self.load_env_file()
         self.root = self.parse_yaml()
         self.current_node = self.root
@@ -43,6 +84,9 @@ class YAMLEditor:
         self.edit_position = 0
         self.edit_scroll_offset = 0  # Add scroll offset for edit pane
         self.edit_mode = False
+        self._last_nav_position = 0  # Selection as of the last paint
+        self._last_edit_position = 0
+        self.status_message: Optional[str] = None  # Shown in the footer until the next key
         self.setup_screen()
 
     def setup_screen(self):
@@ -56,63 +100,122 @@ class YAMLEditor:
 
         curses.curs_set(0)
         self.stdscr.keypad(True)
+        self.stdscr.timeout(50)  # Poll so the loop can do idle-time work
+
+        # Let Ctrl-S reach the editor instead of pausing terminal output,
+        # endwin() restores the original tty modes on exit
+        if termios is not None:
+            try:
+                attrs = termios.tcgetattr(sys.stdin)
+                attrs[0] &= ~termios.IXON
+                termios.tcsetattr(sys.stdin, termios.TCSANOW, attrs)
+                curses.def_prog_mode()
+            except (termios.error, ValueError):
+                pass
 
     def parse_yaml(self) -> YAMLNode:
         try:
-            with open(self.yaml_file, 'r') as f:
-                content = f.read()
-                # Split content into lines to preserve comments
-                lines = content.split('\n')
-                comments = {}
-
-                # Extract comments
-                for i, line in enumerate(lines):
-                    if '#' in line:
-                        key_part = line[:line.index('#')].strip()
-                        comment = line[line.index('#'):].strip()
-                        if key_part:
-                            comments[key_part] = comment
-
-                # Parse YAML
-                data = yaml.safe_load(content)
-                root = YAMLNode('root', data)
-
-                # Add comments to nodes
-                self._add_comments(root, comments)
-
-                # Update values from loaded environment variables
-                self._update_node_values(root)
-
-                return root
+            cached = self._load_cached_tree()
+            root, self._leaves = cached if cached is not None else self._build_tree()
+
+            # Update values from loaded environment variables
+            self._update_node_values()
+
+            return root
         except Exception as e:
             return YAMLNode('root', {'error': f'Failed to load YAML: {str(e)}'})
 
-    def _update_node_values(self, node: YAMLNode):
-        """Update node values with values from export.env"""
-        if node.env_var and node.env_var in self.changes:
-            node.value = self.changes[node.env_var]
-        elif not node.env_var and node.is_leaf:
-            # Check if there's a value for the full path
-            node_path = self.get_node_path(node)
-            if node_path in self.changes:
-                node.value = self.changes[node_path]
-
-        for child in node.children:
-            self._update_node_values(child)
-
-    def _add_comments(self, node: YAMLNode, comments: Dict[str, str]):
-        if node.key in comments:
-            node.comment = comments[node.key]
-        for child in node.children:
-            self._add_comments(child, comments)
+    def _cache_path(self) -> str:
+        """Per-user cache file for the YAML file, keyed by its absolute path"""
+        cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        digest = hashlib.sha256(os.path.abspath(self.yaml_file).encode()).hexdigest()
+        return os.path.join(cache_home, 'thingsboard-tui-configurator', digest + '.cache')
+
+    def _cache_stamp(self) -> bytes:
+        st = os.stat(self.yaml_file)
+        return struct.pack('<qqi', st.st_mtime_ns, st.st_size, CACHE_VERSION)
+
+    def _load_cached_tree(self) -> Optional[Tuple[YAMLNode, List[YAMLNode]]]:
+        """Return the cached tree and its leaves if the cache is still fresh"""
+        try:
+            with open(self._cache_path(), 'rb') as f:
+                # Never unpickle a file someone else could have written
+                st = os.fstat(f.fileno())
+                if hasattr(os, 'getuid') and (st.st_uid != os.getuid() or st.st_mode & 0o022):
+                    return None
+                stamp = self._cache_stamp()
+                if f.read(len(stamp)) != stamp:
+                    return None
+                root, leaves = pickle.load(f)
+                return root, leaves
+        except Exception:
+            return None
+
+    def _build_tree(self) -> Tuple[YAMLNode, List[YAMLNode]]:
+        stamp = self._cache_stamp()
+        with open(self.yaml_file, 'r') as f:
+            content = f.read()
+            comments = {}
+
+            # Extract comments, line by line since the YAML parser drops them
+            for line in content.splitlines():
+                hash_idx = line.find('#')
+                if hash_idx < 0:
+                    continue
+                key_part = line[:hash_idx].strip()
+                if not key_part:
+                    continue
+                comments[key_part] = line[hash_idx:].rstrip()
+
+            # Parse YAML
+            data = yaml.load(content, Loader=SafeLoader)
+            root = YAMLNode('root', data)
+
+            # Add comments to nodes
+            self._add_comments(root, comments)
+
+        leaves = []
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if node.is_leaf:
+                leaves.append(node)
+            stack.extend(node.children)
+
+        # Cache the tree before env values are applied, export.env may change
+        try:
+            cache_path = self._cache_path()
+            os.makedirs(os.path.dirname(cache_path), mode=0o700, exist_ok=True)
+            fd = os.open(cache_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with open(fd, 'wb') as f:
+                f.write(stamp)
+                pickle.dump((root, leaves), f, pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            pass
+
+        return root, leaves
+
+    def _update_node_values(self):
+        """Update leaf values with values from export.env"""
+        changes = self.changes
+        for leaf in self._leaves:
+            # Env-backed leaves are keyed by variable name, the rest by full path
+            key = leaf.env_var or leaf._path
+            if key in changes:
+                leaf.value = changes[key]
+                leaf._edit_display = None
+
+    def _add_comments(self, root: YAMLNode, comments: Dict[str, str]):
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if node.key in comments:
+                node.comment = comments[node.key]
+                node._comment_len = len(node.comment)
+            stack.extend(node.children)
 
     def get_node_path(self, node: YAMLNode) -> str:
-        path = []
-        current = node
-        while current.parent is not None:
-            path.append(current.key)
-            current = current.parent
-        return '_'.join(reversed(path))
+        return node._path
     def load_env_file(self):
         try:
             if os.path.exists('export.env'):
@@ -135,8 +238,9 @@ class YAMLEditor:
         return self.changes != self.original_values
 
     def confirm_exit(self) -> bool:
+        """Return True to keep the editor running, False to exit"""
         if not self.has_unsaved_changes():
-            return True
+            return False
 
         height, width = self.stdscr.getmaxyx()
         confirm_win = curses.newwin(5, 40, height // 2 - 2, width // 2 - 20)
@@ -157,19 +261,21 @@ class YAMLEditor:
 
     def save_changes(self):
         with open('export.env', 'w') as f:
-            for env_name, value in self.changes.items():
-                f.write(f"export {env_name}={value}\n")
-    def get_navigable_nodes(self) -> List[YAMLNode]:
-        return [node for node in self.current_node.children if not node.is_leaf]
+            f.write(''.join(f"export {env_name}={value}\n" for env_name, value in self.changes.items()))
+        self.original_values = dict(self.changes)
+    def get_navigable_nodes(self) -> Sequence[YAMLNode]:
+        return self.current_node._nav_children
 
-    def get_editable_nodes(self) -> List[YAMLNode]:
-        return [node for node in self.current_node.children if node.is_leaf]
+    def get_editable_nodes(self) -> Sequence[YAMLNode]:
+        return self.current_node._edit_children
 
     def draw_screen(self):
-        self.stdscr.clear()
+        self.stdscr.erase()
         height, width = self.stdscr.getmaxyx()
         nav_width = width // 3
-        max_display_items = height - 4  # Reserve space for header and footer
+        max_display_items = max(0, height - 4)  # Reserve space for header and footer
+        max_row_width = nav_width - 3
+        col_edit = nav_width + 2
 
         # Draw divider
         for y in range(height):
@@ -177,57 +283,25 @@ class YAMLEditor:
 
         # Draw titles
         self.stdscr.addstr(0, 2, "Navigation", curses.A_BOLD)
-        self.stdscr.addstr(0, nav_width + 2, "Properties", curses.A_BOLD)
+        self.stdscr.addstr(0, col_edit, "Properties", curses.A_BOLD)
 
         # Draw navigation items with scrolling
         nav_items = self.get_navigable_nodes()
         visible_nav_items = nav_items[self.scroll_offset:self.scroll_offset + max_display_items]
 
         for idx, node in enumerate(visible_nav_items):
-            if idx >= max_display_items:
-                break
-
-            display = f"  {node.key}"
-            if node.comment:
-                display = f"{display} {node.comment}"
-
             actual_idx = idx + self.scroll_offset
-            if actual_idx == self.nav_position and not self.edit_mode:
-                self.stdscr.attron(curses.A_REVERSE)
-                self.stdscr.addstr(idx + 2, 2, display[:nav_width - 3])
-                self.stdscr.attroff(curses.A_REVERSE)
-            else:
-                self.stdscr.addstr(idx + 2, 2, display[:nav_width - 3])
+            selected = actual_idx == self.nav_position and not self.edit_mode
+            self._draw_nav_row(idx + 2, node, selected, max_row_width)
 
         # Draw editable items with scrolling
         edit_items = self.get_editable_nodes()
         visible_edit_items = edit_items[self.edit_scroll_offset:self.edit_scroll_offset + max_display_items]
 
         for idx, node in enumerate(visible_edit_items):
-            if idx >= max_display_items:
-                break
-
-            if node.env_var:
-                value_display = f"{node.value} (${node.env_var})"
-            else:
-                value_display = str(node.value)
-
-            display = f"{node.key}: {value_display}"
             actual_idx = idx + self.edit_scroll_offset
-
-            if actual_idx == self.edit_position and self.edit_mode:
-                self.stdscr.attron(curses.color_pair(2))
-                self.stdscr.addstr(idx + 2, nav_width + 2, display)
-                self.stdscr.attroff(curses.color_pair(2))
-            else:
-                self.stdscr.addstr(idx + 2, nav_width + 2, display)
-
-            if node.comment:
-                comment_pos = nav_width + 4 + len(display)
-                if comment_pos + len(node.comment) < width:
-                    self.stdscr.attron(curses.color_pair(3))
-                    self.stdscr.addstr(idx + 2, comment_pos, node.comment)
-                    self.stdscr.attroff(curses.color_pair(3))
+            selected = actual_idx == self.edit_position and self.edit_mode
+            self._draw_edit_row(idx + 2, node, selected, col_edit, width)
 
         # Draw scroll indicators
         if len(nav_items) > max_display_items:
@@ -247,10 +321,78 @@ class YAMLEditor:
         path_display = f"Path: {path}" if path else "Path: /"
         self.stdscr.addstr(height - 2, 2, path_display, curses.A_DIM)
 
-        help_text = "TAB: Toggle Edit | ENTER: Select/Edit | ESC: Back/Exit | ↑↓: Navigate"
-        self.stdscr.addstr(height - 1, 2, help_text, curses.A_DIM)
+        if self.status_message:
+            self.stdscr.addstr(height - 1, 2, self.status_message[:width - 3], curses.A_BOLD)
+        else:
+            help_text = "TAB: Edit | ENTER: Select | ESC: Back/Exit | ^S: Save | ↑↓: Navigate"
+            self.stdscr.addstr(height - 1, 2, help_text[:width - 3], curses.A_DIM)
+
+        self.stdscr.noutrefresh()
+        curses.doupdate()
+        self._last_nav_position = self.nav_position
+        self._last_edit_position = self.edit_position
+
+    def _draw_nav_row(self, row: int, node: YAMLNode, selected: bool, max_width: int):
+        display = node._nav_display
+        if display is None:
+            display = f"  {node.key}"
+            if node.comment:
+                display = f"{display} {node.comment}"
+            node._nav_display = display
+
+        truncated = display[:max_width]
+        if selected:
+            self.stdscr.attron(curses.A_REVERSE)
+            self.stdscr.addstr(row, 2, truncated)
+            self.stdscr.attroff(curses.A_REVERSE)
+        else:
+            self.stdscr.addstr(row, 2, truncated)
+
+    def _draw_edit_row(self, row: int, node: YAMLNode, selected: bool, col: int, width: int):
+        display = node._edit_display
+        if display is None:
+            if node.env_var:
+                value_display = f"{node.value} (${node.env_var})"
+            else:
+                value_display = str(node.value)
+
+            display = f"{node.key}: {value_display}"
+            node._edit_display = display
+
+        if selected:
+            self.stdscr.attron(curses.color_pair(2))
+            self.stdscr.addstr(row, col, display)
+            self.stdscr.attroff(curses.color_pair(2))
+        else:
+            self.stdscr.addstr(row, col, display)
+
+        if node.comment:
+            comment_pos = col + 2 + len(display)
+            if comment_pos + node._comment_len < width:
+                self.stdscr.attron(curses.color_pair(3))
+                self.stdscr.addstr(row, comment_pos, node.comment)
+                self.stdscr.attroff(curses.color_pair(3))
+
+    def redraw_selection_only(self):
+        """Repaint the previously and newly selected rows without clearing"""
+        height, width = self.stdscr.getmaxyx()
+        nav_width = width // 3
 
-        self.stdscr.refresh()
+        if self.edit_mode:
+            edit_items = self.get_editable_nodes()
+            for pos in (self._last_edit_position, self.edit_position):
+                row = pos - self.edit_scroll_offset + 2
+                self._draw_edit_row(row, edit_items[pos], pos == self.edit_position, nav_width + 2, width)
+        else:
+            nav_items = self.get_navigable_nodes()
+            for pos in (self._last_nav_position, self.nav_position):
+                row = pos - self.scroll_offset + 2
+                self._draw_nav_row(row, nav_items[pos], pos == self.nav_position, nav_width - 3)
+
+        self.stdscr.noutrefresh()
+        curses.doupdate()
+        self._last_nav_position = self.nav_position
+        self._last_edit_position = self.edit_position
 
     def edit_value(self, node: YAMLNode):
         height, width = self.stdscr.getmaxyx()
@@ -284,10 +426,16 @@ class YAMLEditor:
 
         if new_value:
             node.value = new_value
+            node._edit_display = None
             # Save to export.env
             env_name = node.env_var if node.env_var else self.get_node_path(node)
             self.changes[env_name] = new_value
-    def handle_navigation(self, key):
+    def handle_navigation(self, key) -> Tuple[bool, bool]:
+        """Handle a key press, returning (running, dirty)"""
+        scroll_offsets = (self.scroll_offset, self.edit_scroll_offset)
+        nav_items = self.current_node._nav_children
+        edit_items = self.current_node._edit_children
+
         if key == curses.KEY_UP:
             if self.edit_mode:
                 if self.edit_position > 0:
@@ -300,8 +448,7 @@ class YAMLEditor:
                     if self.nav_position < self.scroll_offset:
                         self.scroll_offset = self.nav_position
         elif key == curses.KEY_DOWN:
-            items = self.get_editable_nodes() if self.edit_mode else self.get_navigable_nodes()
-            max_pos = len(items) - 1
+            max_pos = len(edit_items if self.edit_mode else nav_items) - 1
 
             if self.edit_mode:
                 if self.edit_position < max_pos:
@@ -317,19 +464,21 @@ class YAMLEditor:
                         self.scroll_offset = self.nav_position - height + 1
         elif key == ord('\t'):
             self.edit_mode = not self.edit_mode
+            return True, True
         elif key == ord('\n'):
             if self.edit_mode:
-                edit_items = self.get_editable_nodes()
-                if edit_items and 0 <= self.edit_position < len(edit_items):
+                if 0 <= self.edit_position < len(edit_items):
                     self.edit_value(edit_items[self.edit_position])
+                    return True, True
             else:
-                nav_items = self.get_navigable_nodes()
-                if nav_items and 0 <= self.nav_position < len(nav_items):
+                if 0 <= self.nav_position < len(nav_items):
                     self.current_node = nav_items[self.nav_position]
                     self.nav_position = 0
                     self.scroll_offset = 0
                     self.edit_position = 0
                     self.edit_scroll_offset = 0
+                    return True, True
+            return True, False
         elif key == 27:  # ESC
             if self.edit_mode:
                 self.edit_mode = False
@@ -340,15 +489,58 @@ class YAMLEditor:
                 self.edit_position = 0
                 self.edit_scroll_offset = 0
             else:
-                return self.confirm_exit()
-        return True
+                return self.confirm_exit(), True
+            return True, True
+        elif key == 19:  # Ctrl-S
+            if self.has_unsaved_changes():
+                self.save_changes()
+                self.status_message = "Saved changes to export.env"
+            else:
+                self.status_message = "No changes to save"
+            return True, True
+        elif key == curses.KEY_RESIZE:
+            # Keep both selections on screen after the terminal shrinks
+            visible = max(0, self.stdscr.getmaxyx()[0] - 4)
+            if visible:
+                if self.nav_position >= self.scroll_offset + visible:
+                    self.scroll_offset = self.nav_position - visible + 1
+                if self.edit_position >= self.edit_scroll_offset + visible:
+                    self.edit_scroll_offset = self.edit_position - visible + 1
+            return True, True
+        else:
+            return True, False
+
+        # Only UP/DOWN get here: a scroll needs a full redraw, a plain
+        # selection move just repaints the two affected rows
+        if (self.scroll_offset, self.edit_scroll_offset) != scroll_offsets:
+            return True, True
+        if (self.nav_position, self.edit_position) == (self._last_nav_position, self._last_edit_position):
+            return True, False
+
+        # Both rows must be on screen, or the fast path would draw past the window
+        visible = max(0, self.stdscr.getmaxyx()[0] - 4)
+        if self.edit_mode:
+            offset, positions = self.edit_scroll_offset, (self._last_edit_position, self.edit_position)
+        else:
+            offset, positions = self.scroll_offset, (self._last_nav_position, self.nav_position)
+        if not all(offset <= pos < offset + visible for pos in positions):
+            return True, True
+
+        self.redraw_selection_only()
+        return True, False
 
     def run(self):
+        self.draw_screen()
         running = True
         while running:
-            self.draw_screen()
             key = self.stdscr.getch()
-            running = self.handle_navigation(key)
+            if key == -1:  # No key within the timeout
+                continue
+            had_status = self.status_message is not None
+            self.status_message = None
+            running, dirty = self.handle_navigation(key)
+            if running and (dirty or had_status):
+                self.draw_screen()
 
 
 def main(stdscr, yaml_file: str):
@@ -357,8 +549,6 @@ def main(stdscr, yaml_file: str):
 
 
 if __name__ == "__main__":
-    import sys
-
     if len(sys.argv) != 2:
         print("Usage: python yaml_editor.py <yaml_file>")
         sys.exit(1)